@@ -1,33 +1,166 @@
-from .Model import Model
-from typing import Union, Any, Dict
+from __future__ import annotations
+from .Model import Model, ModelNotTrained
+from collections import OrderedDict
+from typing import Union, Any, Dict, Optional, Iterable
 import numpy as np
 import pandas as pd
 from datetime import timedelta
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.linalg import solve, LinAlgError # type: ignore
 from statsmodels.tsa.api import VAR
-from statsmodels.tsa.vector_ar.var_model import VARResults
+
+from ._kernels import finalize, fits_int32, var_extend, var_weights
+from .helpers import fingerprint
+
+
+def _var_coefs(data_fd: np.ndarray, lags: int) -> np.ndarray:
+    """ Least squares estimate of the coefficients of a trendless VAR(lags),
+        shaped (lags, d, d) like `VARResults.coefs`.
+        Solves the normal equations with a Cholesky factorization instead of
+        going through statsmodels, using their dual form when there are
+        fewer samples than regressors (minimum-norm solution, as `lstsq`). """
+    d = data_fd.shape[1]
+    # Row t of the design matrix holds [y_{t-1}, ..., y_{t-lags}]
+    windows = sliding_window_view(data_fd[:-1], lags, axis=0)
+    design = np.ascontiguousarray(windows[:, :, ::-1].transpose(0, 2, 1)).reshape(-1, lags * d)
+    target = data_fd[lags:]
+    try:
+        if design.shape[0] >= design.shape[1]:
+            params = solve(design.T @ design, design.T @ target, assume_a='pos')
+        else:
+            params = design.T @ solve(design @ design.T, target, assume_a='pos')
+    except LinAlgError:
+        params = np.linalg.lstsq(design, target, rcond=1e-15)[0]
+    return params.reshape(lags, d, d).swapaxes(1, 2)
+
+
+def _fit_var(data_fd: np.ndarray, max_lag: int, ic: Optional[str], data_hash: int) -> np.ndarray:
+    """ Fits the VAR model on differenced data and returns its coefficients.
+        `data_hash` stands for `data_fd` in the cache key,
+        `data_fd` itself is ignored by the cache. """
+    if ic is None:
+        return _var_coefs(data_fd, max_lag)
+    return VAR(endog=data_fd).fit(maxlags=max_lag, ic=ic, trend="n").coefs
 
 
 # noinspection PyMethodOverriding
 class AutoRegModel(Model):
     """ Predicts times series based on correlation with time delayed versions """
     max_lag: int
-    _model: VARResults
+    input_shape: Optional[tuple] = None
+    _coefs: np.ndarray
+    _weights: np.ndarray
+    _forecast_cache: OrderedDict
+    _runtime_attributes = Model._runtime_attributes + ('_forecast_cache',)
 
-    def _train(self, data: np.ndarray, max_lag: int = 300, *args: Any, **kwargs: Any) -> None:
+    def __init__(self, input_shape: Optional[tuple] = None, *args, **kwargs):
+        """
+        :param input_shape: Shape of a row of data, i.e. (number of variables,).
+         Default: None, any number of variables is accepted for training.
+        """
+        super().__init__(input_shape, *args, **kwargs)
+        self.input_shape = input_shape
+        self._forecast_cache = OrderedDict()
+
+    def _train(self, data: np.ndarray, max_lag: int = 300, ic: Optional[str] = None,
+               *args: Any, **kwargs: Any) -> None:
+        """ Fits a VAR model on the first-order differences of the data.
+
+        :param max_lag: Lag order of the model, or the highest one to try when `ic` is given.
+        :param ic: Information criterion used by statsmodels to select the lag order
+         ('aic', 'fpe', 'hqic' or 'bic'). Default: None, max_lag is used as-is,
+         which skips statsmodels entirely.
+        """
+        assert self.input_shape is None or data.shape[1:] == tuple(self.input_shape), \
+            "Wrong number of variables"
         data_fd = np.diff(data, axis=0)
         assert data_fd.shape[0] >= max_lag
-        model = VAR(endog=data_fd)
+        fit_var = self._cache_memory.cache(_fit_var, ignore=['data_fd'])
         self.max_lag = max_lag
-        self._model = model.fit(maxlags=max_lag, trend="n")
+        self._coefs = fit_var(data_fd, max_lag, ic, fingerprint(data_fd))
+        self._weights = var_weights(self._coefs)
+        self._forecast_cache.clear()
 
     def _predict(self, data: np.ndarray, steps: int = 200, *args: Any, **kwargs: Any) -> np.ndarray:
+        return self.predict_batch(data, [steps])[steps]
+
+    def predict_batch(self, data: np.ndarray, step_list: Iterable[int]) -> Dict[int, np.ndarray]:
+        """
+        Predicts several horizons at once from the same data, with a single forecast
+        as long as the furthest one. Bypasses the model's prediction cache.
+
+        :param data: Past values, at least max_lag + 1 rows of them.
+        :param step_list: Numbers of steps to predict.
+        :return: The predictions for each number of steps, as int32. They are slices
+         of the same array, and thus share their memory.
+        :raises OverflowError: When the predictions could exceed the int32 range
+         (or aren't finite).
+        """
+        if not self.trained:
+            raise ModelNotTrained("Trying to predict using an untrained model !")
+        step_list = list(step_list)
+        d, k_ar = self._weights.shape[0], self._coefs.shape[0]
         assert data.shape[0] > self.max_lag, "Missing values"
-        data_fd = np.diff(data, axis=0)
+        assert data.shape[1] == d, "Wrong number of variables"
+        assert all(steps >= 0 for steps in step_list)
+        max_steps = max(step_list, default=0)
+
+        # The forecast only depends on the last k_ar + 1 rows: forecasts already
+        # made from the same rows are reused, and extended if too short
+        tail = data[data.shape[0] - k_ar - 1:]
+        key = fingerprint(tail)
+        history = self._forecast_cache.pop(key, None)
+        if history is None:
+            history = np.empty((k_ar + max_steps, d))
+            np.subtract(tail[1:], tail[:-1], out=history[:k_ar])
+            var_extend(history, self._weights, k_ar)
+        elif history.shape[0] < k_ar + max_steps:
+            history = self.continue_forecast(history, k_ar + max_steps - history.shape[0])
+        self._forecast_cache[key] = history
+        if len(self._forecast_cache) > self.predict_cache_size:
+            self._forecast_cache.popitem(last=False)
+
+        preds_fd = history[k_ar:k_ar + max_steps].copy()
+        # Predictions are rounded anyway: return them as int32, half the size of float64
+        if not fits_int32(preds_fd, data[-1], 1.005):
+            raise OverflowError("Predictions may not fit in int32")
+        preds = finalize(preds_fd, data[-1], 1.005, out=np.empty(preds_fd.shape, dtype=np.int32))
+        return {steps: preds[:steps] for steps in step_list}
+
+    def continue_forecast(self, history: np.ndarray, steps: int) -> np.ndarray:
+        """
+        Extends a forecast of first-order differences by a few more steps.
+        The forecast is linear in the last max_lag values, so it can be
+        resumed where it stopped.
+
+        :param history: Past first-order differences (at least max_lag of them),
+         optionally followed by already forecasted ones.
+        :param steps: Number of steps to add to the forecast.
+        :return: A copy of history followed by the new forecasted differences.
+        """
+        if not self.trained:
+            raise ModelNotTrained("Trying to forecast using an untrained model !")
+        assert history.shape[0] >= self._coefs.shape[0], "Missing values"
+        assert history.shape[1] == self._weights.shape[0], "Wrong number of variables"
         assert steps >= 0
-        preds_fd = self._model.forecast(data_fd, steps=steps)
-        preds = np.cumsum(preds_fd*1.005, axis=0) + data[-1]
-        preds = np.rint(preds)
-        return preds
+        extended = np.empty((history.shape[0] + steps, history.shape[1]))
+        extended[:history.shape[0]] = history
+        var_extend(extended, self._weights, history.shape[0])
+        return extended
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state['_forecast_cache'] = OrderedDict()
+        return state
+
+    def reset(self) -> AutoRegModel:
+        self._forecast_cache.clear()
+        super().reset()
+        return self
+
+    def clear_cache(self, *, soft=False):
+        self._forecast_cache.clear()
+        super().clear_cache(soft=soft)
 
     def predict_duration(self, df: pd.DataFrame, duration: timedelta, return_dataframe: bool = True) \
             -> Union[pd.DataFrame, np.ndarray]:
@@ -64,17 +197,17 @@ class AutoRegModel(Model):
         """
         assert isinstance(df.index, pd.DatetimeIndex), "DataFrame's index should be a datetime !"
         data = df.values
-        time_diffs = np.diff(df.index.to_pydatetime())
+        # Stays on the int64 timestamps instead of Python datetime objects
+        stamps = df.index.values
+        time_diffs = np.diff(stamps.view(np.int64))
         assert len(time_diffs) > 0, "Missing values"
-        median_delta = np.median(time_diffs)
-        try:
-            steps = int(np.ceil(duration/median_delta)) + 1
-        except ZeroDivisionError:
-            raise AssertionError("Invalid time steps")
+        median_delta = pd.Timedelta(int(np.median(time_diffs)), unit=np.datetime_data(stamps.dtype)[0])
+        assert median_delta != pd.Timedelta(0), "Invalid time steps"
+        steps = int(np.ceil(pd.Timedelta(duration) / median_delta)) + 1
 
         preds = self.predict(data, steps)
         if return_dataframe:
-            indices = np.cumsum([median_delta] * steps) + df.index[-1]
+            indices = df.index[-1] + pd.to_timedelta(np.arange(1, steps + 1) * median_delta.value, unit='ns')
             index = pd.Index(data=indices, name=df.index.name)
             return pd.DataFrame(data=preds, index=index, columns=df.columns)
         else:
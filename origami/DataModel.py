@@ -1,6 +1,6 @@
 """ DataModel related stuff """
 from __future__ import annotations
-from typing import TypeVar, Generic
+from typing import TypeVar, Generic, Optional, Any
 from abc import ABC, abstractmethod
 from pathlib import Path
 
@@ -17,28 +17,47 @@ DT = TypeVar('DT')
 
 class DataModel(Serializable, Generic[DT], ABC):
     """ An interface to check data integrity automatically """
+    _integrity_ok: Optional[bool] = None
 
     def __init__(self, *args, **kwargs):
         """ Default DataModel init just adds the kwargs as new attributes
             and checks for integrity. """
         self.__dict__.update(kwargs)
 
-        if not self.check_integrity():
+        if not self.integrity():
             raise IntegrityError("Data failed integrity check when "\
                                  f"initializing the {self.__class__.__name__} object.")
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        """ Assigning a public attribute invalidates the cached integrity """
+        if not name.startswith('_'):
+            object.__setattr__(self, '_integrity_ok', None)
+        object.__setattr__(self, name, value)
+
     @abstractmethod
     def check_integrity(self) -> bool:
         """ Checks the data integrity """
         raise NotImplementedError()
 
+    def integrity(self) -> bool:
+        """ Checks the data integrity, only once until the data changes.
+            Mutating the data in place (e.g. writing into an array)
+            isn't detected: call `invalidate_integrity` afterwards. """
+        if self._integrity_ok is None:
+            self._integrity_ok = bool(self.check_integrity())
+        return self._integrity_ok
+
+    def invalidate_integrity(self) -> None:
+        """ Forces the next `integrity` call to check the data again """
+        self._integrity_ok = None
+
     @abstractmethod
     def _dump(self, filepath: Path, *args, **kwargs) -> None:
         """ Implementation of how to dump the data to a file. """
         raise NotImplementedError()
 
-    @abstractmethod
     @classmethod
+    @abstractmethod
     def _load(cls, filepath: Path, *args, **kwargs) -> DataModel:
         """ Implementation of how to load the data from a file. """
         raise NotImplementedError()
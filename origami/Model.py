@@ -2,13 +2,54 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
+import glob
+import os
 import warnings
 import shutil
-from typing import final, Any
+import threading
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from typing import final, Any, Hashable, Optional, Set, Tuple, Union
+import numpy as np
 from joblib import Memory # type: ignore
+from joblib.memory import MemorizedFunc # type: ignore
 
 from .Serializable import Serializable
 from .DataModel import DataModel, IntegrityError
+from .helpers import fingerprint, default_cache_dir
+
+def _copy_output(output: Any) -> Any:
+    """ Copies a prediction. Arrays memory-mapped from a file come back as regular arrays. """
+    if isinstance(output, np.ndarray):
+        return np.array(output, subok=not isinstance(output, np.memmap))
+    return deepcopy(output)
+
+def _integrity(data: Any) -> bool:
+    """ Plain NumPy arrays, which models may work on directly, have no integrity check """
+    return data.integrity() if isinstance(data, DataModel) else True
+
+_pending_deletions: Set[str] = set()
+_pending_deletions_lock = threading.Lock()
+
+def _delete_in_background(path: str) -> None:
+    """ Deletes a directory tree in a background thread. The thread isn't a daemon,
+        so the interpreter finishes the deletion before exiting. """
+    with _pending_deletions_lock:
+        if path in _pending_deletions:
+            return
+        _pending_deletions.add(path)
+    def delete():
+        shutil.rmtree(path, ignore_errors=True)
+        with _pending_deletions_lock:
+            _pending_deletions.discard(path)
+    threading.Thread(target=delete).start()
+
+def _predict_on_disk(model: Model, data: DataModel, args: tuple, kwargs: dict, key: Hashable) -> DataModel:
+    """ Calls model._predict, to be cached on disk.
+        `key` stands for all the other arguments in the cache key,
+        which are ignored by the cache. """
+    return model._predict(data, *args, **kwargs)
 
 class ModelNotTrained(UserWarning):
     """ Raised when trying to use an untrained model to predict """
@@ -16,11 +57,31 @@ class ModelNotTrained(UserWarning):
 class Model(Serializable, ABC):
     """ A base class for any predictive model """
     trained: bool = False
+    use_disk_cache: bool = False
+    predict_cache_size: int = 32
+    # Size the on-disk cache is trimmed down to, which only happens at the end of `train`:
+    # predictions written since may exceed it until the next training
+    cache_bytes_limit: Union[int, str] = '1G'
     _cache_memory: Memory
+    _predict_cached: Optional[MemorizedFunc] = None
+    _predict_cache: OrderedDict
+    _state_hash: Optional[int] = None
+    # Attributes left out of the trained state's fingerprint
+    _runtime_attributes: Tuple[str, ...] = ('_cache_memory', '_predict_cached', '_predict_cache',
+                                            '_state_hash')
+
+    def __init__(self, *args, use_disk_cache: bool = False, **kwargs):
+        """ Initialises the model object
 
-    def __init__(self, *args, **kwargs):
-        """ Initialises the model object """
-        self._cache_memory = Memory(location=None, verbose=False)
+        :param use_disk_cache: Whether to cache predictions (and whatever the model caches
+         while training) on disk with joblib, which persists them across processes
+         but hashes and pickles every call.
+         Default: False, predictions are cached in memory and nothing is written to disk.
+        """
+        self.use_disk_cache = use_disk_cache
+        self._cache_memory = self._make_memory()
+        self._predict_cached = None
+        self._predict_cache = OrderedDict()
 
     @final
     def train(self, data: DataModel, /, *args: Any, **kwargs: Any) -> None:
@@ -29,16 +90,16 @@ class Model(Serializable, ABC):
 
         :param data: Data with which to train
         """
-        if not isinstance(data, DataModel):
-            raise TypeError("Argument data should be of type DataModel,"\
+        if not isinstance(data, (DataModel, np.ndarray)):
+            raise TypeError("Argument data should be of type DataModel or ndarray,"\
                            f"found {data.__class__.__name__}")
-        if not data.check_integrity():
+        if not _integrity(data):
             raise IntegrityError("Data failed integrity check before training")
         self._train(data, *args, **kwargs)
         self.trained = True
-        # Note: Cache isn't shared between "freshly created" instances and "loaded from file" instances !
-        # However, cache IS shared between all instances loaded from files
-        self._cache_memory = Memory(location=f"./model_cache", verbose=False)
+        self._predict_cache.clear()
+        self._state_hash = None
+        self._cache_memory.reduce_size(bytes_limit=self.cache_bytes_limit)
 
     @final
     def predict(self, data: DataModel, /, *args: Any, check_output=True, **kwargs: Any) -> DataModel:
@@ -52,26 +113,120 @@ class Model(Serializable, ABC):
         if not self.trained:
             raise ModelNotTrained("Trying to predict using an untrained model !"\
                                   "Results may not be satisfying.")
-        if not isinstance(data, DataModel):
-            raise TypeError("Argument data should be of type DataModel,"\
+        if not isinstance(data, (DataModel, np.ndarray)):
+            raise TypeError("Argument data should be of type DataModel or ndarray,"\
                            f"found {data.__class__.__name__}")
-        if not data.check_integrity():
+        if not _integrity(data):
             raise IntegrityError("Data failed integrity check before predicting")
 
         # Tries to use self._predict's cached results first
-        predict_cached = self._cache_memory.cache(self._predict)
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
-            output = predict_cached(data, *args, **kwargs)
-        if check_output and not output.check_integrity():
+            if self.use_disk_cache:
+                if self._predict_cached is None:
+                    self._predict_cached = self._cache_memory.cache(
+                        _predict_on_disk, ignore=['model', 'data', 'args', 'kwargs'])
+                key = (self._state_fingerprint(), self._cache_key(data, args, kwargs))
+                output = self._predict_cached(self, data, args, kwargs, key)
+            else:
+                output = self._predict_in_memory(data, args, kwargs)
+        if check_output and not _integrity(output):
             raise IntegrityError("Prediction failed integrity check")
         return output
 
+    def reset(self) -> Model:
+        """ Brings the model back to its untrained state, dropping its in-memory caches.
+            Cheaper than copying a pristine untrained model. """
+        self.trained = False
+        self._cache_memory = self._make_memory()
+        self._state_hash = None
+        self._predict_cached = None
+        self._predict_cache.clear()
+        return self
+
+    def __deepcopy__(self, memo: dict) -> Model:
+        """ Deep copies the model, except for its joblib Memory
+            which is recreated over the same location. """
+        clone = self.__class__.__new__(self.__class__)
+        memo[id(self)] = clone
+        state = self.__getstate__()
+        memory = state.pop('_cache_memory')
+        clone.__dict__.update(deepcopy(state, memo))
+        clone._cache_memory = Memory(location=memory.location, verbose=False)
+        return clone
+
     def clear_cache(self, *, soft=False):
         """ Clears the model's prediction cache """
-        self._cache_memory.clear(warn=False)
-        if not soft:
-            shutil.rmtree(self._cache_memory.location, ignore_errors=True)
+        self._predict_cache.clear()
+        location = self._cache_memory.location
+        if location is None:
+            return
+        # Moves the cache out of the way at once, and deletes it in the background,
+        # along with caches left over by earlier interrupted deletions
+        try:
+            os.rename(location, f"{location}.stale.{os.getpid()}.{time.time_ns()}")
+        except OSError:
+            pass
+        for stale in glob.glob(f"{glob.escape(location)}.stale.*"):
+            _delete_in_background(stale)
+        if soft:
+            # Recreates the (empty) cache directory
+            self._cache_memory = Memory(location=location, verbose=False)
+            self._predict_cached = None
+
+    @classmethod
+    def _cache_dir(cls) -> str:
+        """ Location of the on-disk cache of this class of models """
+        return os.path.join(default_cache_dir(), cls.__name__)
+
+    def _make_memory(self) -> Memory:
+        """ The joblib Memory behind the on-disk cache, which is shared by every
+            instance of the class, freshly created or loaded from a file.
+            Without `use_disk_cache`, it doesn't store anything. """
+        location = self._cache_dir() if self.use_disk_cache else None
+        return Memory(location=location, verbose=False)
+
+    def _state_fingerprint(self) -> int:
+        """ Content hash of the model's state, leaving its caches out """
+        if self._state_hash is None:
+            # Arrays are hashed by content, regardless of their memory layout
+            state = sorted((name, fingerprint(value) if isinstance(value, np.ndarray) else value)
+                           for name, value in self.__getstate__().items()
+                           if name not in self._runtime_attributes)
+            self._state_hash = fingerprint(state)
+        return self._state_hash
+
+    def _predict_in_memory(self, data: DataModel, args: tuple, kwargs: dict) -> DataModel:
+        """ Calls self._predict through the in-memory LRU prediction cache """
+        key = self._cache_key(data, args, kwargs)
+        if key in self._predict_cache:
+            self._predict_cache.move_to_end(key)
+            output = self._predict_cache[key]
+        else:
+            output = self._predict(data, *args, **kwargs)
+            self._predict_cache[key] = output
+            if len(self._predict_cache) > self.predict_cache_size:
+                self._predict_cache.popitem(last=False)
+        # Callers get their own copy, so that they can't alter the cached one
+        return _copy_output(output)
+
+    def _cache_key(self, data: DataModel, args: tuple, kwargs: dict) -> Hashable:
+        """ Builds the prediction cache key from a content hash of the data
+            and the remaining arguments """
+        params: Any = (args, tuple(sorted(kwargs.items())))
+        try:
+            hash(params)
+        except TypeError:
+            params = fingerprint(params)
+        return fingerprint(data), params
+
+    def __getstate__(self) -> dict:
+        """ The in-memory caches aren't serialized, so that they don't bloat dumps.
+            Neither is the joblib wrapper, rebuilt when needed. """
+        state = self.__dict__.copy()
+        state['_predict_cache'] = OrderedDict()
+        state['_predict_cached'] = None
+        return state
 
     @abstractmethod
     def _train(self, data: DataModel, *args: Any, **kwargs: Any) -> None:
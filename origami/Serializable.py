@@ -1,10 +1,11 @@
 """ Serialization relation stuff """
 from __future__ import annotations
 from abc import ABC
-from typing import final, Any
+from typing import final, Any, Optional
 from pathlib import Path
 
 import os
+import warnings
 import joblib # type: ignore
 
 from .helpers import FileTypeError, PathType, convert_path
@@ -25,10 +26,11 @@ class Serializable(ABC):
          see `joblib.dump <https://joblib.readthedocs.io/en/latest/generated/joblib.dump.html#joblib.dump>`_.
         """
         filepath = convert_path(filepath)
-        if not filepath.parent.is_dir():
-            raise FileTypeError(f"{filepath.parent} is not in a valid directory.")
-        if not os.access(str(filepath.parent.resolve().absolute()), os.W_OK):
-            raise FileTypeError(f"{filepath.parent} is not writable.")
+        parent = filepath.parent
+        if not parent.is_dir():
+            raise FileTypeError(f"{parent} is not in a valid directory.")
+        if not os.access(parent, os.W_OK):
+            raise FileTypeError(f"{parent} is not writable.")
         self._dump(filepath, *args, **kwargs)
 
     @classmethod
@@ -43,17 +45,34 @@ class Serializable(ABC):
         filepath = convert_path(filepath)
         if not filepath.is_file():
             raise FileTypeError(f"{filepath} is not in a valid file.")
-        if not os.access(str(filepath.resolve().absolute()), os.R_OK):
+        if not os.access(filepath, os.R_OK):
             raise FileTypeError(f"{filepath} is not readable.")
         obj = cls._load(filepath, *args, **kwargs)
         assert isinstance(obj, cls)
         return obj
 
-    def _dump(self, filepath: Path, *args: Any, **kwargs: Any) -> None:
-        """ Implementation of how to dump the instance to a file. """
-        joblib.dump(value=self, filename=filepath)
+    def _dump(self, filepath: Path, *args: Any, compress: Any = 0, **kwargs: Any) -> None:
+        """ Implementation of how to dump the instance to a file.
+            NumPy arrays are written as raw buffers (pickle protocol 5) so that
+            they can be memory-mapped back by `_load`, which only works when
+            the file isn't compressed (no `compress` and no compression extension).
+            The file is written aside and then moved in place, so that arrays
+            memory-mapped from the file being replaced stay valid. """
+        # Keeps the extension, from which joblib infers the compression
+        tmp_filepath = filepath.with_name(f".{filepath.stem}.{os.getpid()}.tmp{filepath.suffix}")
+        try:
+            joblib.dump(value=self, filename=tmp_filepath, compress=compress, protocol=5)
+            os.replace(tmp_filepath, filepath)
+        finally:
+            if tmp_filepath.exists():
+                tmp_filepath.unlink()
 
     @classmethod
-    def _load(cls, filepath: Path, *args: Any, **kwargs: Any) -> Serializable:
-        """ Implementation of how to load the instance from a file. """
-        return joblib.load(filename=filepath)
+    def _load(cls, filepath: Path, *args: Any, mmap_mode: Optional[str] = None, **kwargs: Any) -> Serializable:
+        """ Implementation of how to load the instance from a file.
+            With `mmap_mode='r'`, NumPy arrays of uncompressed files are
+            memory-mapped read-only instead of being copied in memory. """
+        with warnings.catch_warnings():
+            # Compressed files are simply loaded in memory
+            warnings.filterwarnings("ignore", message=".*not compatible with compressed file")
+            return joblib.load(filename=filepath, mmap_mode=mmap_mode)
@@ -0,0 +1,20 @@
+# cython: language_level=3
+""" Cython versions of the numerical kernels, for internal use only """
+
+cimport cython
+from libc.math cimport rint
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def finalize(double[:, ::1] preds_fd, double[::1] base, double factor, int[:, ::1] out):
+    """ See `origami._kernels.finalize`, the caller ensures the values fit in `out` """
+    cdef Py_ssize_t T = preds_fd.shape[0], D = preds_fd.shape[1]
+    cdef Py_ssize_t t, j
+    cdef double s
+    for j in range(D):
+        s = 0.0
+        for t in range(T):
+            s += preds_fd[t, j] * factor
+            out[t, j] = <int> rint(s + base[j])
+    return out.base
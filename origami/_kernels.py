@@ -0,0 +1,95 @@
+""" Compiled numerical kernels, with plain NumPy fallbacks for internal use only """
+
+import numpy as np
+
+try:
+    from numba import njit, prange # type: ignore
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+try:
+    from . import _fast # type: ignore
+except ImportError:
+    _fast = None
+
+
+def _finalize_numpy(preds_fd: np.ndarray, base: np.ndarray, factor: float, out: np.ndarray) -> np.ndarray:
+    preds_fd *= factor
+    np.cumsum(preds_fd, axis=0, out=preds_fd)
+    preds_fd += base
+    np.rint(preds_fd, out=out, casting='unsafe')
+    return out
+
+
+if HAVE_NUMBA:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _finalize_numba(preds_fd, base, factor, out):
+        T, D = preds_fd.shape
+        for j in prange(D):
+            s = 0.0
+            b = base[j]
+            for t in range(T):
+                s += preds_fd[t, j] * factor
+                out[t, j] = np.rint(s + b)
+        return out
+
+
+def _extend_numpy(history: np.ndarray, weights: np.ndarray, start: int) -> np.ndarray:
+    n_lags = weights.shape[1] // weights.shape[0]
+    for t in range(start, history.shape[0]):
+        history[t] = weights @ history[t - n_lags:t].reshape(-1)
+    return history
+
+
+if HAVE_NUMBA:
+    @njit(fastmath=True, cache=True)
+    def _extend_numba(history, weights, start):
+        T, d = history.shape
+        n_lags = weights.shape[1] // d
+        window = history.reshape(-1)
+        for t in range(start, T):
+            offset = (t - n_lags) * d
+            for i in range(d):
+                acc = 0.0
+                for r in range(n_lags * d):
+                    acc += weights[i, r] * window[offset + r]
+                history[t, i] = acc
+        return history
+
+
+def var_weights(coefs: np.ndarray) -> np.ndarray:
+    """ Lays out VAR coefficients shaped (p, d, d) (`VARResults.coefs`) as a
+        (d, p * d) matrix to be applied to the flattened last p observations,
+        oldest first. """
+    p, d, _ = coefs.shape
+    return np.ascontiguousarray(coefs[::-1].transpose(1, 0, 2).reshape(d, p * d))
+
+
+def var_extend(history: np.ndarray, weights: np.ndarray, start: int) -> np.ndarray:
+    """ Forecasts a trendless VAR process in place: fills the rows of `history`
+        from `start` onwards from the ones before, with weights laid out by `var_weights`.
+        `history` must be a C-contiguous float64 array with at least p rows before `start`. """
+    if not HAVE_NUMBA:
+        return _extend_numpy(history, weights, start)
+    return _extend_numba(history, weights, start)
+
+
+def fits_int32(preds_fd: np.ndarray, base: np.ndarray, factor: float) -> bool:
+    """ Whether `finalize(preds_fd, base, factor, ...)` is sure to stay within
+        the int32 range, bounding each column by |base| + |factor| * sum(|preds_fd|). """
+    bound = np.abs(base) + abs(factor) * np.abs(preds_fd).sum(axis=0)
+    return bool(np.all(bound < np.iinfo(np.int32).max))
+
+
+def finalize(preds_fd: np.ndarray, base: np.ndarray, factor: float, out: np.ndarray) -> np.ndarray:
+    """ Integrates first-order differences back into levels in a single pass:
+        `out = rint(cumsum(preds_fd * factor, axis=0) + base)`.
+        `out` may be `preds_fd` itself or an integer array, in which case
+        the values must fit in it (see `fits_int32`), `preds_fd` may be overwritten. """
+    if _fast is not None and out.dtype == np.int32 and out.flags.c_contiguous:
+        return _fast.finalize(np.ascontiguousarray(preds_fd, dtype=np.float64),
+                              np.ascontiguousarray(base, dtype=np.float64), float(factor), out)
+    if not HAVE_NUMBA:
+        return _finalize_numpy(preds_fd, base, factor, out)
+    return _finalize_numba(np.asarray(preds_fd), np.asarray(base), float(factor), np.asarray(out))
@@ -1,8 +1,14 @@
 """ Helper functions and types for internal use only """
 
-from typing import Union
+from typing import Union, Any
 from os import PathLike
 from pathlib import Path
+import os
+import pickle
+import stat
+
+import numpy as np
+import xxhash # type: ignore
 
 class PathTypeError(ValueError):
     """ A generic exception raised when the provided value
@@ -21,7 +27,59 @@ PathType = Union[PathLike, str]
 def convert_path(path: PathType) -> Path:
     """ Tries to convert a PathType into
         a plausible path (if necessary) """
-    if isinstance(path, (PathLike, str)):
+    if isinstance(path, Path):
+        return path
+    if isinstance(path, (str, PathLike)):
         return Path(path)
     raise PathTypeError("Path should be either be a string or "\
                         "implement the PathLike interface !")
+
+
+def fingerprint(obj: Any) -> int:
+    """ Computes a fast 64 bits content hash of an object,
+        stable across processes (unlike `hash`).
+        NumPy arrays are hashed directly from their raw buffer
+        (along with their shape and dtype), anything else is
+        pickled first. """
+    if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+        buffer = obj if obj.flags.c_contiguous else np.ascontiguousarray(obj)
+        hasher = xxhash.xxh3_64(f"{obj.shape}{obj.dtype.str}".encode())
+        hasher.update(buffer.data)
+        return hasher.intdigest()
+    return xxhash.xxh3_64_intdigest(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _is_private_dir(path: str) -> bool:
+    """ Creates the directory if needed, and tells whether it's really a directory
+        (not a symlink) owned by the current user, that no one else can access.
+        Anyone able to write into the cache could make joblib unpickle anything. """
+    try:
+        os.mkdir(path, mode=0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def default_cache_dir() -> str:
+    """ Location of the models' on-disk cache.
+        Taken from the ORIGAMI_CACHE_DIR environment variable if set,
+        otherwise a private directory in memory, so that the cache stays
+        memory-resident: in $XDG_RUNTIME_DIR, or else a per-user one
+        in shared memory (/dev/shm). ./model_cache is the last resort. """
+    location = os.environ.get("ORIGAMI_CACHE_DIR")
+    if location:
+        return location
+    if hasattr(os, "getuid"):
+        candidates = [f"/dev/shm/origami_cache_{os.getuid()}"]
+        if os.environ.get("XDG_RUNTIME_DIR"):
+            candidates.insert(0, os.path.join(os.environ["XDG_RUNTIME_DIR"], "origami_cache"))
+        for candidate in candidates:
+            if _is_private_dir(candidate):
+                return candidate
+    return "./model_cache"
@@ -1,4 +1,13 @@
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
+
+try:
+    from Cython.Build import cythonize
+except ImportError:
+    # The compiled kernels are optional, origami falls back on NumPy/Numba
+    ext_modules = []
+else:
+    ext_modules = cythonize([Extension('origami._fast', ['origami/_fast.pyx'], extra_compile_args=['-O3'])],
+                            language_level=3)
 
 with open('README.rst', 'r') as f:
     readme = f.read()
@@ -19,6 +28,8 @@ setup(
     url='https://github.com/sam1902/Origami',
     license=license,
     packages=find_packages(exclude=('tests', 'docs')),
-    install_requires=requirements
+    ext_modules=ext_modules,
+    install_requires=requirements,
+    extras_require={'numba': ['numba >= 0.50']}
 )
 
@@ -8,8 +8,11 @@ import os
 from datetime import timedelta
 from time import time
 from copy import deepcopy
+from statsmodels.tsa.api import VAR
 
 from origami import AutoRegModel
+from origami.Model import ModelNotTrained
+from origami.AutoRegModel import _var_coefs
 
 
 class TestAutoRegModel(unittest.TestCase):
@@ -34,7 +37,7 @@ class TestAutoRegModel(unittest.TestCase):
 
     def test_train(self):
         self.assertRaises(AssertionError, self.model.train, self.df.values[:200], max_lag=300)
-        self.assertRaises(AssertionError, self.model.train, self.df, max_lag=300)
+        self.assertRaises(TypeError, self.model.train, self.df, max_lag=300)
         self.assertRaises(AssertionError, self.model.train, self.df[self.df.columns[:-1]].values, max_lag=300)
 
         self.model.train(self.df[:1000].values, max_lag=300)
@@ -43,12 +46,67 @@ class TestAutoRegModel(unittest.TestCase):
         self.model.train(self.df[:1000].values, max_lag=300)
 
         self.assertRaises(AssertionError, self.model.predict, self.df.values[:200], steps=5)
-        self.assertRaises(AssertionError, self.model.predict, self.df, steps=5)
+        self.assertRaises(TypeError, self.model.predict, self.df, steps=5)
         self.assertRaises(AssertionError, self.model.predict, self.df[self.df.columns[:-1]].values, steps=5)
         self.assertRaises(AssertionError, self.model.predict, self.df.values[:301], steps=-1)
         self.model.predict(self.df.values[:301], steps=0)
         self.model.predict(self.df.values[:301], steps=30)
 
+    def test_var_coefs(self):
+        data_fd = np.diff(self.df[:1000].values.astype(float), axis=0)
+        # More samples than regressors (normal equations), then fewer (dual form)
+        for lags in (5, 300):
+            expected = VAR(data_fd).fit(maxlags=lags, trend="n").coefs
+            coefs = _var_coefs(data_fd, lags)
+            self.assertEqual(coefs.shape, expected.shape)
+            np.testing.assert_allclose(coefs, expected, rtol=0, atol=1e-10)
+
+    def test_incremental_forecast(self):
+        self.model.train(self.df[:1000].values, max_lag=300)
+        fresh_model = deepcopy(self.original_model)
+        fresh_model.train(self.df[:1000].values, max_lag=300)
+
+        inputs = self.df.values[:301]
+        p30 = self.model.predict(inputs, steps=30)
+        # Extends the cached 30 steps forecast rather than starting over
+        p70 = self.model.predict(inputs, steps=70)
+        expected = fresh_model.predict(inputs, steps=70)
+
+        self.assertTrue(np.equal(p70, expected).all())
+        self.assertTrue(np.equal(p30, expected[:30]).all())
+
+    def test_predict_overflow(self):
+        self.model.train(self.df[:1000].values, max_lag=300)
+        self.assertEqual(self.model.predict(self.df.values[:301], steps=30).dtype, np.int32)
+        self.assertRaises(OverflowError, self.model.predict, self.df.values[:301] + 2**31, steps=30)
+        self.assertRaises(OverflowError, self.model.predict, self.df.values[:301] * 1e8, steps=30)
+
+    def test_continue_forecast(self):
+        history = np.diff(self.df.values[:301], axis=0).astype(float)
+        self.assertRaises(ModelNotTrained, self.model.continue_forecast, history, 5)
+
+        self.model.train(self.df[:1000].values, max_lag=300)
+        self.assertRaises(AssertionError, self.model.continue_forecast, history[:-1], 5)
+        self.assertRaises(AssertionError, self.model.continue_forecast, history[:, :-1], 5)
+        self.assertRaises(AssertionError, self.model.continue_forecast, history, -1)
+
+        extended = self.model.continue_forecast(self.model.continue_forecast(history, 30), 40)
+        np.testing.assert_allclose(extended, self.model.continue_forecast(history, 70))
+
+    def test_predict_batch(self):
+        self.model.train(self.df[:1000].values, max_lag=300)
+        inputs = self.df.values[100:500]
+
+        preds = self.model.predict_batch(inputs, [0, 30, 70])
+        self.assertEqual(sorted(preds), [0, 30, 70])
+        for steps, pred in preds.items():
+            self.assertEqual(pred.shape, (steps, len(self.df.columns)))
+            self.assertTrue(np.equal(pred, self.model.predict(inputs, steps=steps)).all())
+        # The horizons are slices of the same forecast
+        self.assertTrue(np.shares_memory(preds[30], preds[70]))
+        self.assertEqual(self.model.predict_batch(inputs, []), {})
+        self.assertRaises(AssertionError, self.model.predict_batch, inputs, [30, -1])
+
     def test_predict_duration(self):
         self.model.train(self.df[:1000].values, max_lag=300)
 
@@ -80,22 +138,82 @@ class TestAutoRegModel(unittest.TestCase):
         dt_3 = time() - t3
 
         t4 = time()
-        self.model.predict(self.df.values[:301], steps=70)
+        p4 = self.model.predict(self.df.values[:301], steps=70)
         dt_4 = time() - t4
 
         p5 = self.model.predict(self.df.values[100:500], steps=30)
 
         self.assertLess(dt_2, dt_1)
         self.assertAlmostEqual(dt_2, dt_3, delta=dt_1/10)
+        # A longer horizon isn't cached, but extends the forecast made for p1
         self.assertGreater(dt_4, dt_2)
-        self.assertGreater(dt_4, dt_1)
 
-        assert all([np.equal(p, p1).all() for p in [p2, p3]])
+        assert all([np.equal(p, p1).all() for p in [p2, p3, p4[:30]]])
         assert not any([np.equal(p, p5).all() for p in [p1, p2, p3]])
 
-    def test_dump_load(self):
+    def test_prediction_caching_mutated_input(self):
         self.model.train(self.df[:1000].values, max_lag=300)
+        inputs = self.df.values[:301].copy()
+        inputs.flags.writeable = False
+        p1 = self.model.predict(inputs, steps=30)
 
+        # The cache is keyed on the data's content, whatever its flags say
+        inputs.flags.writeable = True
+        inputs[-1] += 1000
+        inputs.flags.writeable = False
+        p2 = self.model.predict(inputs, steps=30)
+
+        self.assertFalse(np.equal(p1, p2).all())
+        self.assertTrue(np.equal(p2, self.model.predict(inputs.copy(), steps=30)).all())
+
+    def test_reset(self):
+        self.model.train(self.df[:1000].values, max_lag=300)
+        pred = self.model.predict(self.df.values[:301], steps=30)
+
+        model = deepcopy(self.model)
+        self.assertTrue(model.trained)
+        self.assertTrue(np.equal(model.predict(self.df.values[:301], steps=30), pred).all())
+
+        # The clone gets a Memory of its own, over the same location
+        self.assertIsNot(model._cache_memory, self.model._cache_memory)
+        self.assertEqual(model._cache_memory.location, self.model._cache_memory.location)
+
+        self.assertGreater(len(model._predict_cache), 0)
+        self.assertGreater(len(model._forecast_cache), 0)
+        model.reset()
+        self.assertFalse(model.trained)
+        self.assertEqual(len(model._predict_cache), 0)
+        self.assertEqual(len(model._forecast_cache), 0)
+        self.assertRaises(ModelNotTrained, model.predict, self.df.values[:301], steps=30)
+
+        self.assertTrue(self.model.trained)
+        self.assertGreater(len(self.model._predict_cache), 0)
+
+        disk_model = AutoRegModel((len(self.df.columns),), use_disk_cache=True)
+        clone = deepcopy(disk_model)
+        self.assertIsNot(clone._cache_memory, disk_model._cache_memory)
+        self.assertIsNotNone(clone._cache_memory.location)
+        self.assertEqual(clone._cache_memory.location, disk_model._cache_memory.location)
+
+    def test_dump_skips_caches(self):
+        self.model.train(self.df[:1000].values, max_lag=300)
+        fp_1, fp_2 = f"test_model{int(time())}_1.joblib", f"test_model{int(time())}_2.joblib"
+        try:
+            self.model.dump(fp_1)
+            pred = self.model.predict(self.df.values[:301], steps=30)
+            self.model.dump(fp_2)
+            self.assertEqual(os.path.getsize(fp_1), os.path.getsize(fp_2))
+
+            model = AutoRegModel.load(fp_2)
+            self.assertEqual(len(model._predict_cache), 0)
+            self.assertEqual(len(model._forecast_cache), 0)
+            self.assertTrue(np.equal(model.predict(self.df.values[:301], steps=30), pred).all())
+        finally:
+            for fp in (fp_1, fp_2):
+                if os.path.exists(fp):
+                    os.remove(fp)
+
+    def test_dump_load(self):
         def chrono_model(model):
             """ Times the model's prediction """
             t = time()
@@ -105,36 +223,36 @@ class TestAutoRegModel(unittest.TestCase):
 
         def reload_model(self):
             """ Dumps, del and loads the model from a file """
-            #fp = Path(f"test_model{int(time())}.joblib.gz")
             fp = f"test_model{int(time())}.joblib.gz"
             self.model.dump(fp)
             del self.model
             self.model = AutoRegModel.load(fp)
             os.remove(fp)
 
-        pred_1, dt_1 = chrono_model(self.model)
-        pred_2, dt_2 = chrono_model(self.model)
-
-        reload_model(self)
-
-        pred_3, dt_3 = chrono_model(self.model)
-        pred_4, dt_4 = chrono_model(self.model)
+        for use_disk_cache in (False, True):
+            with self.subTest(use_disk_cache=use_disk_cache):
+                self.model = AutoRegModel((len(self.df.columns),), use_disk_cache=use_disk_cache)
+                self.model.clear_cache()
+                self.model.train(self.df[:1000].values, max_lag=300)
 
-        reload_model(self)
+                pred_1, dt_1 = chrono_model(self.model)
+                pred_2, dt_2 = chrono_model(self.model)
 
-        pred_5, dt_5 = chrono_model(self.model)
+                reload_model(self)
 
-        # Cache before and after dumping/reloading isn't shared
-        # however, once the model has been dumped/reloaded once, it is shared
-        # I suspect that's because the dumped/reloaded versions are mapped to disk
-        # while the freshly instantiated one isn't.
+                pred_3, dt_3 = chrono_model(self.model)
+                pred_4, dt_4 = chrono_model(self.model)
 
-        self.assertGreater(dt_1/2, dt_2)
-        self.assertAlmostEqual(dt_1, dt_3, delta=dt_2)
-        self.assertAlmostEqual(dt_2, dt_4, delta=dt_2/5)
-        self.assertAlmostEqual(dt_4, dt_5, delta=dt_2/5)
+                # The in-memory cache isn't dumped along with the model, so the reloaded
+                # model starts over. The on-disk cache lives in a location shared by the
+                # whole class, so the reloaded model hits what the first one stored.
+                self.assertGreater(dt_1/2, dt_2)
+                if use_disk_cache:
+                    self.assertGreater(dt_1/2, dt_3)
+                else:
+                    self.assertGreater(dt_3/2, dt_4)
 
-        self.assertTrue(np.equal(pred_1, pred_3).all())
+                self.assertTrue(all(np.equal(pred, pred_1).all() for pred in [pred_2, pred_3, pred_4]))
 
 
 if __name__ == '__main__':
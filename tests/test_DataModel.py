@@ -0,0 +1,59 @@
+import unittest
+from pathlib import Path
+
+from origami.DataModel import DataModel, IntegrityError
+
+
+class Counts(DataModel[list]):
+    """ Non-negative counts, recording how often they were checked """
+    def __init__(self, values, **kwargs):
+        self._checks = 0
+        self.values = values
+        super().__init__(**kwargs)
+
+    def check_integrity(self) -> bool:
+        self._checks += 1
+        return all(value >= 0 for value in self.values)
+
+    def _dump(self, filepath: Path, *args, **kwargs) -> None:
+        raise NotImplementedError()
+
+    @classmethod
+    def _load(cls, filepath: Path, *args, **kwargs) -> DataModel:
+        raise NotImplementedError()
+
+
+class TestDataModel(unittest.TestCase):
+    def test_integrity_checked_once(self):
+        data = Counts([1, 2, 3])
+        self.assertEqual(data._checks, 1)
+        self.assertTrue(data.integrity())
+        self.assertTrue(data.integrity())
+        self.assertEqual(data._checks, 1)
+
+    def test_public_assignment_rechecks(self):
+        data = Counts([1, 2, 3])
+        data.values = [1, -2, 3]
+        self.assertFalse(data.integrity())
+        self.assertEqual(data._checks, 2)
+
+        # Private attributes don't hold the data
+        data._other = None
+        self.assertFalse(data.integrity())
+        self.assertEqual(data._checks, 2)
+
+    def test_invalidate_integrity(self):
+        data = Counts([1, 2, 3])
+        # In place mutations go unnoticed until the integrity is invalidated
+        data.values[1] = -2
+        self.assertTrue(data.integrity())
+        data.invalidate_integrity()
+        self.assertFalse(data.integrity())
+        self.assertEqual(data._checks, 2)
+
+    def test_init_fails_integrity(self):
+        self.assertRaises(IntegrityError, Counts, [1, -2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
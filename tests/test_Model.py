@@ -0,0 +1,62 @@
+import unittest
+from unittest import mock
+import os
+import tempfile
+from time import sleep
+
+import numpy as np
+
+from origami import Model
+
+
+class Mean(Model):
+    """ Predicts the mean of the data """
+    _mean: np.ndarray
+
+    def _train(self, data, *args, **kwargs) -> None:
+        self._mean = data.mean(axis=0)
+
+    def _predict(self, data, *args, **kwargs):
+        return self._mean.copy()
+
+
+class TestClearCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"ORIGAMI_CACHE_DIR": self.cache_dir.name})
+        self.env.start()
+        self.model = Mean(use_disk_cache=True)
+        self.model.train(np.arange(12.).reshape(4, 3))
+        self.model.predict(np.ones((2, 3)))
+        self.location = self.model._cache_memory.location
+
+    def tearDown(self) -> None:
+        self.env.stop()
+        self.cache_dir.cleanup()
+
+    def wait_emptied(self) -> bool:
+        """ Waits for the background deletions to empty the cache directory """
+        for _ in range(100):
+            if not os.listdir(self.cache_dir.name):
+                return True
+            sleep(0.05)
+        return False
+
+    def test_clear_cache_twice(self):
+        self.assertTrue(os.path.isdir(self.location))
+        self.model.clear_cache()
+        self.model.clear_cache()
+        self.assertFalse(os.path.exists(self.location))
+        self.model.clear_cache(soft=True)
+        self.assertTrue(np.equal(self.model.predict(np.ones((2, 3))), [4.5, 5.5, 6.5]).all())
+
+    def test_sweeps_leftovers(self):
+        leftover = f"{self.location}.stale.0.0"
+        os.makedirs(os.path.join(leftover, "some", "entry"))
+        self.model.clear_cache()
+        # Both the leftover and the cache just cleared are deleted
+        self.assertTrue(self.wait_emptied())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from unittest import mock
+import os
+import stat
+import tempfile
+
+from origami.helpers import default_cache_dir
+
+
+@unittest.skipUnless(hasattr(os, "getuid"), "Needs POSIX file ownership")
+class TestDefaultCacheDir(unittest.TestCase):
+    def setUp(self) -> None:
+        self.runtime_dir = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.runtime_dir.name, "origami_cache")
+        self.env = mock.patch.dict(os.environ, {"XDG_RUNTIME_DIR": self.runtime_dir.name})
+        self.env.start()
+        os.environ.pop("ORIGAMI_CACHE_DIR", None)
+
+    def tearDown(self) -> None:
+        self.env.stop()
+        self.runtime_dir.cleanup()
+
+    def test_private_dir(self):
+        self.assertEqual(default_cache_dir(), self.location)
+        st = os.lstat(self.location)
+        self.assertTrue(stat.S_ISDIR(st.st_mode))
+        self.assertEqual(st.st_mode & 0o777, 0o700)
+        self.assertEqual(default_cache_dir(), self.location)
+
+    def test_rejects_shared_dir(self):
+        os.mkdir(self.location)
+        os.chmod(self.location, 0o777)
+        self.assertNotEqual(default_cache_dir(), self.location)
+
+    def test_rejects_symlink(self):
+        target = os.path.join(self.runtime_dir.name, "elsewhere")
+        os.mkdir(target, mode=0o700)
+        os.symlink(target, self.location)
+        self.assertNotEqual(default_cache_dir(), self.location)
+
+    def test_environment_override(self):
+        with mock.patch.dict(os.environ, {"ORIGAMI_CACHE_DIR": "/some/where"}):
+            self.assertEqual(default_cache_dir(), "/some/where")
+
+
+if __name__ == '__main__':
+    unittest.main()